@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Launcher for the A2A agent server
+
+Imports proper_a2a_agent instead of running it as __main__, so a
+mypyc-compiled extension built next to the source is used when present.
+"""
+
+from proper_a2a_agent import main
+
+
+if __name__ == "__main__":
+    main()
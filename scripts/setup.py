@@ -0,0 +1,14 @@
+"""
+Build proper_a2a_agent as a C extension with mypyc
+
+Run from this directory so the extension is written next to the source:
+    cd scripts && python setup.py build_ext --inplace
+"""
+
+from setuptools import setup
+from mypyc.build import mypycify
+
+setup(
+    name="proper-a2a-agent",
+    ext_modules=mypycify(["proper_a2a_agent.py"]),
+)